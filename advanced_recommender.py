@@ -1,46 +1,100 @@
 import os
+import threading
 from datetime import datetime
+from typing import Iterator
 
-import yfinance as yf
-import pandas as pd
 import numpy as np
+from cachetools import TTLCache
 from dotenv import load_dotenv
 import google.generativeai as genai
+try:
+    from numba import njit
+except ImportError:  # fall back to scipy's C IIR filter for the EMAs
+    njit = None
+    from scipy.signal import lfilter
 
-# Load API keys
-dotenv_path = os.getenv('DOTENV_PATH', None)
-if dotenv_path:
-    from dotenv import load_dotenv as _ld
-    _ld(dotenv_path)
-else:
-    load_dotenv()
+from market_data import as_float_array, get_history, sma_all
+
+# Load API keys (DOTENV_PATH overrides the default .env lookup)
+load_dotenv(os.getenv('DOTENV_PATH'))
+_GEMINI_KEY = os.getenv("GEMINI_API_KEY")
 
 # Configure Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+genai.configure(api_key=_GEMINI_KEY)
 llm = genai.GenerativeModel('gemini-2.0-flash')
 generation_config = {"temperature": 0.4, "max_output_tokens": 800}
 
+# Built once at import and filled with str.format per call
+_RECOMMEND_TMPL = """
+You are a senior market analyst with deep expertise.
+Analyze the following metrics for {ticker} as of {now}:
 
-def _compute_rsi(series: pd.Series, period: int = 14) -> float:
-    delta = series.diff().dropna()
-    up = delta.clip(lower=0)
-    down = -delta.clip(upper=0)
-    ma_up = up.rolling(window=period).mean()
-    ma_down = down.rolling(window=period).mean()
-    rs = ma_up / ma_down
-    return float(100 - (100 / (1 + rs.iloc[-1])))
+- Current Price: ${price:.2f}
+- 50-Day SMA:    ${sma_50:.2f}
+- 200-Day SMA:   ${sma_200:.2f}
+- RSI (14):      {rsi:.2f}
+- MACD:          {macd:.4f}
+- Signal Line:   {signal:.4f}
+- Volatility (20d): {volatility:.2f}%
+- Avg. Volume (50d): {avg_vol:,.0f}
 
+Using these metrics, provide a comprehensive, free-form analysis that includes:
+1. Market stance and context (bullish/bearish/neutral).
+2. Detailed recommendation (Buy/Hold/Sell) with rationale.
+3. Key risks or caveats.
+4. Price targets or forecast ranges if appropriate.
 
-def _compute_macd(series: pd.Series, fast: int = 12, slow: int = 26, signal: int = 9) -> dict:
-    exp1 = series.ewm(span=fast, adjust=False).mean()
-    exp2 = series.ewm(span=slow, adjust=False).mean()
-    macd_line = exp1 - exp2
-    signal_line = macd_line.ewm(span=signal, adjust=False).mean()
-    return {"macd": float(macd_line.iloc[-1]), "signal": float(signal_line.iloc[-1])}
+Explain your reasoning in plain English, dive into which indicators matter most for this ticker, and tailor the depth to what an advanced trader would expect."""
 
 
-def _compute_volatility(series: pd.Series, period: int = 20) -> float:
-    return float(series.pct_change().rolling(window=period).std().iloc[-1] * 100)
+def _compute_rsi(close: np.ndarray, period: int = 14) -> float:
+    d = np.diff(as_float_array(close))[-period:]
+    up = np.where(d > 0, d, 0.0).mean()
+    down = np.where(d < 0, -d, 0.0).mean()
+    if down == 0:
+        return 100.0
+    return float(100 - (100 / (1 + up / down)))
+
+
+def _ema(x: np.ndarray, alpha: float) -> np.ndarray:
+    """ewm(adjust=False).mean() as a first-order IIR filter seeded with x[0]"""
+    y, _ = lfilter([alpha], [1, alpha - 1], x, zi=[x[0] * (1 - alpha)])
+    return y
+
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _macd_last(x, a_fast, a_slow, a_sig):
+        # Same recurrences as ewm(adjust=False), keeping only the running values
+        f = s = x[0]
+        m = 0.0
+        sig = 0.0
+        for i in range(len(x)):
+            f = a_fast * x[i] + (1 - a_fast) * f
+            s = a_slow * x[i] + (1 - a_slow) * s
+            m = f - s
+            sig = a_sig * m + (1 - a_sig) * sig if i else m
+        return m, sig
+
+
+def _compute_macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> dict:
+    x = as_float_array(close)
+    a_fast, a_slow, a_sig = 2 / (fast + 1), 2 / (slow + 1), 2 / (signal + 1)
+    if njit is None:
+        macd_line = _ema(x, a_fast) - _ema(x, a_slow)
+        signal_line = _ema(macd_line, a_sig)
+        return {"macd": float(macd_line[-1]), "signal": float(signal_line[-1])}
+    macd, sig = _macd_last(x, a_fast, a_slow, a_sig)
+    return {"macd": float(macd), "signal": float(sig)}
+
+
+def _compute_volatility(close: np.ndarray, period: int = 20) -> float:
+    # Only the latest window is reported, so skip the full rolling std
+    tail = as_float_array(close)[-(period + 1):]
+    if len(tail) <= period:
+        return float("nan")
+    returns = np.diff(tail) / tail[:-1]
+    return float(returns.std(ddof=1) * 100)
 
 
 class AdvancedRecommender:
@@ -48,42 +102,57 @@ class AdvancedRecommender:
     Provides a free-form, advanced analysis and recommendation for a given stock ticker.
     """
 
+    def __init__(self, ttl: int = 300):
+        # Finished analyses per ticker, so repeat requests skip the LLM call
+        self._cache = TTLCache(maxsize=256, ttl=ttl)
+        self._cache_lock = threading.Lock()
+
     def recommend(self, ticker: str) -> str:
+        return "".join(self.recommend_stream(ticker)).strip()
+
+    def recommend_stream(self, ticker: str) -> Iterator[str]:
+        """Yield the analysis text chunk by chunk as Gemini generates it."""
+        with self._cache_lock:
+            cached = self._cache.get(ticker)
+        if cached is not None:
+            yield cached
+            return
+
         # 1. Fetch historical data
-        hist = yf.Ticker(ticker).history(period="1y", auto_adjust=False)
+        hist = get_history(ticker)
         if hist.empty:
-            return f"No historical data available for {ticker}."
+            yield f"No historical data available for {ticker}."
+            return
 
         price = float(hist['Close'].iloc[-1])
-        sma_50 = float(hist['Close'].rolling(window=50).mean().iloc[-1])
-        sma_200 = float(hist['Close'].rolling(window=200).mean().iloc[-1])
-        rsi = _compute_rsi(hist['Close'])
-        macd_vals = _compute_macd(hist['Close'])
-        volatility = _compute_volatility(hist['Close'])
-        avg_vol = float(hist['Volume'].rolling(window=50).mean().iloc[-1])
+        close = hist['Close'].to_numpy(dtype=np.float32)
+        smas = sma_all(close)
+        sma_50 = float(smas[50][-1])
+        sma_200 = float(smas[200][-1])
+        rsi = _compute_rsi(close)
+        macd_vals = _compute_macd(close)
+        volatility = _compute_volatility(close)
+        avg_vol = float(sma_all(hist['Volume'].to_numpy(), (50,))[50][-1])
 
         # 2. Build a dynamic prompt
-        prompt = f"""
-You are a senior market analyst with deep expertise.
-Analyze the following metrics for {ticker} as of {datetime.now().strftime('%Y-%m-%d %H:%M')}:
-
-- Current Price: ${price:.2f}
-- 50-Day SMA:    ${sma_50:.2f}
-- 200-Day SMA:   ${sma_200:.2f}
-- RSI (14):      {rsi:.2f}
-- MACD:          {macd_vals['macd']:.4f}
-- Signal Line:   {macd_vals['signal']:.4f}
-- Volatility (20d): {volatility:.2f}%
-- Avg. Volume (50d): {avg_vol:,.0f}
-
-Using these metrics, provide a comprehensive, free-form analysis that includes:
-1. Market stance and context (bullish/bearish/neutral).
-2. Detailed recommendation (Buy/Hold/Sell) with rationale.
-3. Key risks or caveats.
-4. Price targets or forecast ranges if appropriate.
-
-Explain your reasoning in plain English, dive into which indicators matter most for this ticker, and tailor the depth to what an advanced trader would expect."""
+        prompt = _RECOMMEND_TMPL.format(
+            ticker=ticker,
+            now=datetime.now().strftime('%Y-%m-%d %H:%M'),
+            price=price,
+            sma_50=sma_50,
+            sma_200=sma_200,
+            rsi=rsi,
+            macd=macd_vals['macd'],
+            signal=macd_vals['signal'],
+            volatility=volatility,
+            avg_vol=avg_vol,
+        )
 
         # 3. Call Gemini
-        response = llm.generate_content(prompt, generation_config=generation_config)
-        return response.text.strip()
+        response = llm.generate_content(prompt, generation_config=generation_config, stream=True)
+        chunks = []
+        for chunk in response:
+            chunks.append(chunk.text)
+            yield chunk.text
+        with self._cache_lock:
+            self._cache[ticker] = "".join(chunks).strip()
@@ -1,163 +1,397 @@
-
 from datetime import datetime
-import yfinance as yf
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import threading
 from tavily import TavilyClient
+import diskcache
+from cachetools import TTLCache
+import numpy as np
+import pandas as pd
 import os
-from typing import List, Dict, Union
+from typing import Iterator, List, Dict, Union
 from dotenv import load_dotenv
 import google.generativeai as genai
-from datetime import datetime
-from typing import List, Dict, Union
+from market_data import get_history, get_info, sma_all
+from analysis_parser import parse_analysis, split_article_blocks
+
+# Resolve configuration once at import (DOTENV_PATH overrides the default .env lookup)
+load_dotenv(os.getenv("DOTENV_PATH"))
+_TAVILY_KEY = os.getenv("TAVILY_API_KEY")
+_GEMINI_KEY = os.getenv("GEMINI_API_KEY")
+_USE_LLM_GATE = bool(os.getenv("USE_LLM_GATE"))
+
+genai.configure(api_key=_GEMINI_KEY)
+
+# Article summaries persist across runs, keyed by URL (or content hash)
+_sumcache = diskcache.Cache(".cache/summ")
+# Tavily results per ticker; news moves in minutes, so entries expire
+_newscache = diskcache.Cache(".cache/news")
+_NEWS_TTL = 600
+
+# Prompt templates, built once at import and filled with str.format per call
+_SUMMARY_TMPL = """
+Summarize this article in 3-5 concise bullet points:
+{text}
+
+Format strictly as:
+- Point 1
+- Point 2
+- Point 3
+"""
+
+_BATCH_SUMMARY_TMPL = """
+Summarize each article below in 3-5 concise bullet points.
+Return one block per article, in the same order, each starting
+with its ===ARTICLE N=== line.
+
+{blocks}
+
+Format strictly as:
+===ARTICLE 1===
+- Point 1
+- Point 2
+- Point 3
+"""
+
+_ANALYSIS_TMPL = """
+Stock Analysis Report for {ticker}:
+
+Current Price: ${price:.2f}
+50-Day SMA: ${sma_50:.2f}
+200-Day SMA: ${sma_200:.2f}
+
+Recent News:
+{news_context}
+
+Provide:
+1. Recommendation (Buy/Hold/Sell)
+2. 3 Key Reasons (bullet points)
+3. Price Targets (Conservative/Aggressive)
+
+Format exactly as:
+Recommendation: [Your Verdict]
+Reasons:
+- Reason 1
+- Reason 2
+- Reason 3
+Targets:
+- Conservative: $X
+- Aggressive: $Y
+"""
+
+_NEED_NEWS_TMPL = """
+We have the following data for a stock:
+- Current Price: ${price:.2f}
+- 50-Day SMA: ${sma_50:.2f}
+- 200-Day SMA: ${sma_200:.2f}
+
+Question: Do you need recent news articles to give a better
+Buy/Hold/Sell recommendation? Answer ONLY "Yes" or "No".
+"""
+
+
+def _summary_key(text: str, url: str) -> str:
+    return url or hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
 
-load_dotenv()
 
 class MarketAgent:
-    def __init__(self):
+    def __init__(self, ttl: int = 300):
         """Initialize with API clients"""
-        self.tavily = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+        self.tavily = TavilyClient(api_key=_TAVILY_KEY)
         
-        # Configure Gemini
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        # Gemini is configured at import
         self.llm = genai.GenerativeModel('gemini-2.0-flash')
         self.generation_config = {
             "temperature": 0.3,
             "max_output_tokens": 1000,
         }
+        # Shared pool for the I/O-bound Gemini calls that can overlap
+        self._pool = ThreadPoolExecutor(max_workers=5)
+        # Finished analyses per ticker, replayed by analyze_iter
+        self._cache = TTLCache(maxsize=256, ttl=ttl)
+        self._cache_lock = threading.Lock()
 
 # inside your MarketAgent class...
 
     def analyze(self, ticker: str) -> Dict[str, Union[str, float, List]]:
         """End-to-end agentic pipeline with reasoning log."""
+        result: Dict = {}
+        for part in self.analyze_iter(ticker):
+            result.update(part)
+        result.pop("section", None)
+        return result
+
+    def analyze_iter(self, ticker: str) -> Iterator[Dict]:
+        """
+        Run the pipeline, yielding each section as soon as it is ready:
+        "price" (quote, SMAs, history), "news", then "ai" (analysis plus
+        the reasoning log). A failed data fetch yields a single "error"
+        section. Completed runs are replayed from cache for a few minutes.
+        """
+        with self._cache_lock:
+            cached = self._cache.get(ticker)
+        if cached is not None:
+            yield from cached
+            return
+
+        sections = []
+        for part in self._run_pipeline(ticker):
+            sections.append(part)
+            yield part
+        if sections[-1]["section"] != "error":
+            with self._cache_lock:
+                self._cache[ticker] = sections
+
+    def _run_pipeline(self, ticker: str) -> Iterator[Dict]:
         reasoning: List[str] = []
 
-        # Step 1: Fetch stock data
+        # Step 1: Fetch stock data (quote info loads alongside)
         reasoning.append(f"Step 1: Fetching 1y history for {ticker}")
+        info_future = self._pool.submit(get_info, ticker)
         stock_data = self._get_stock_data(ticker)
         if "error" in stock_data:
-            return {**stock_data, "reasoning": reasoning}
+            yield {"section": "error", **stock_data, "reasoning": reasoning}
+            return
 
         price   = stock_data["current_price"]
         sma_50  = stock_data["sma_50"]
         sma_200 = stock_data["sma_200"]
         reasoning.append(f"  → Got price ${price:.2f}, SMA50 ${sma_50:.2f}, SMA200 ${sma_200:.2f}")
 
+        try:
+            info = info_future.result()
+        except Exception:
+            info = {}
+
+        yield {
+            "section":        "price",
+            "ticker":         ticker,
+            "price":          price,
+            "sma_50":         sma_50,
+            "sma_200":        sma_200,
+            "price_history":  stock_data.get("price_history", []),
+            "sma_50_history": stock_data.get("sma_50_history", []),
+            "sma_200_history":stock_data.get("sma_200_history", []),
+            "hist_df":        stock_data["hist_df"],
+            "info":           info,
+        }
+
         # Step 2: Computing SMAs (already done above)
         reasoning.append("Step 2: SMAs computed")
 
-        # Step 3: Ask Gemini if news is needed
-        reasoning.append("Step 3: Asking Gemini if news is needed")
+        # Step 3: Decide if news is needed
+        reasoning.append("Step 3: Deciding if news is needed")
         need_news = self._decide_need_news(price, sma_50, sma_200)
-        reasoning.append(f"  → Gemini says: {'Yes' if need_news else 'No'}")
+        reasoning.append(f"  → Need news: {'Yes' if need_news else 'No'}")
 
         # Step 4: Conditionally fetch news
         if need_news:
             reasoning.append("Step 4: Fetching top-3 news articles")
-            news_data = self._get_news(ticker)
-            count = len(news_data.get("news", []))
-            reasoning.append(f"  → Received {count} articles")
+            try:
+                news = self._fetch_news(ticker)
+            except Exception:
+                news = []
         else:
             reasoning.append("Step 4: Skipping news fetch")
-            news_data = {"news": []}
+            news = []
 
-        # Step 5: Summarize & analyze with Gemini
-        reasoning.append("Step 5: Generating recommendation with Gemini")
-        analysis = self._generate_analysis(
+        # The analysis prompt only needs titles and sources, so it runs while
+        # the articles are being summarized rather than after
+        analysis_future = self._pool.submit(
+            self._generate_analysis,
             ticker=ticker,
             price=price,
             sma_50=sma_50,
             sma_200=sma_200,
-            news_items=news_data["news"],
+            news_items=news,
         )
+        try:
+            for article, summary in zip(news, self._summarize_articles(news)):
+                article["summary"] = summary
+        except Exception:
+            news = []
+        if need_news:
+            reasoning.append(f"  → Received {len(news)} articles")
+
+        yield {"section": "news", "news": news}
+
+        # Step 5: Summarize & analyze with Gemini
+        reasoning.append("Step 5: Generating recommendation with Gemini")
+        analysis = analysis_future.result()
         verdict = analysis.get("recommendation", "N/A")
         reasoning.append(f"  → Recommendation: {verdict}")
 
-        # Build final result
-        result = {
-            "ticker":         ticker,
-            "price":          price,
-            "sma_50":         sma_50,
-            "sma_200":        sma_200,
-            "news":           news_data.get("news", []),
+        yield {
+            "section":        "ai",
             "analysis":       analysis,
             "timestamp":      datetime.now().isoformat(),
-            "price_history":  stock_data.get("price_history", []),
-            "sma_50_history": stock_data.get("sma_50_history", []),
-            "sma_200_history":stock_data.get("sma_200_history", []),
             "reasoning":      reasoning,
         }
 
-        return result
+    def analyze_many(self, tickers: List[str]) -> Dict[str, Dict]:
+        """Latest technical indicators for a watchlist, computed in one batch."""
+        # numba is only required for the batch path
+        from indicators_numba import batch_indicators
+
+        closes = {}
+        results: Dict[str, Dict] = {}
+        futures = {ticker: self._pool.submit(get_history, ticker) for ticker in tickers}
+        for ticker, future in futures.items():
+            try:
+                hist = future.result()
+            except Exception as e:
+                # One failed download shouldn't sink the rest of the watchlist
+                results[ticker] = {"error": f"Stock data error: {str(e)}"}
+                continue
+            if hist.empty:
+                results[ticker] = {"error": f"No historical data found for {ticker}"}
+            else:
+                closes[ticker] = hist["Close"].to_numpy(dtype=np.float32)
+        if not closes:
+            return results
+
+        # Right-align histories so every row ends on the latest close
+        width = max(len(c) for c in closes.values())
+        close2d = np.full((len(closes), width), np.nan, dtype=np.float32)
+        for row, c in zip(close2d, closes.values()):
+            row[width - len(c):] = c
+
+        sma50, sma200, rsi, macd, signal = batch_indicators(close2d)
+        for k, (ticker, c) in enumerate(closes.items()):
+            results[ticker] = {
+                "ticker":  ticker,
+                "price":   float(c[-1]),
+                "sma_50":  float(sma50[k]),
+                "sma_200": float(sma200[k]),
+                "rsi":     float(rsi[k]),
+                "macd":    float(macd[k]),
+                "signal":  float(signal[k]),
+            }
+        return {ticker: results[ticker] for ticker in tickers}
 
 
     def _get_stock_data(self, ticker: str) -> Dict:
         """Fetch price and technical indicators"""
         try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period="1y")
+            hist = get_history(ticker)
             
             if hist.empty:
                 return {"error": f"No historical data found for {ticker}"}
             
+            close_np = hist["Close"].to_numpy(dtype=np.float32)
+            smas = sma_all(close_np, (50, 200))
             return {
                 "ticker": ticker,
-                "current_price": hist["Close"].iloc[-1],
-                "sma_50": hist["Close"].rolling(50).mean().iloc[-1],
-                "sma_200": hist["Close"].rolling(200).mean().iloc[-1],
-                "price_history": hist["Close"].tolist(),
-                "sma_50_history": hist["Close"].rolling(50).mean().tolist(),
-                "sma_200_history": hist["Close"].rolling(200).mean().tolist()
+                "current_price": float(close_np[-1]),
+                "sma_50": float(smas[50][-1]),
+                "sma_200": float(smas[200][-1]),
+                "price_history": close_np,
+                "sma_50_history": smas[50],
+                "sma_200_history": smas[200],
+                # Chart frame on the real trading dates, sharing the arrays above
+                "hist_df": pd.DataFrame({
+                    "Price": close_np,
+                    "50-Day SMA": smas[50],
+                    "200-Day SMA": smas[200],
+                }, index=hist.index, copy=False),
             }
         except Exception as e:
             return {"error": f"Stock data error: {str(e)}"}
 
-    def _get_news(self, ticker: str) -> Dict:
-        """Fetch and summarize top 3 news articles"""
-        try:
+    def _fetch_news(self, ticker: str) -> List[Dict]:
+        """Top 3 news articles from Tavily; summaries are added separately"""
+        news = _newscache.get(ticker)
+        if news is None:
             news = self.tavily.search(
                 query=f"{ticker} stock news",
                 include_raw_content=True,
                 include_domain=True,
                 max_results=3
             )
-            
-            processed_news = []
-            for article in news.get("results", [])[:3]:
-                processed_news.append({
-                    "title": article.get("title", "Untitled Article"),
-                    "source": article.get("source", "Unknown"),
-                    "url": article.get("url", ""),
-                    "published_date": article.get("published_date", "Date not available"),
-                    "content": article.get("content", ""),
-                    "summary": self._summarize_article(article.get("content", ""))
-                })
-            
-            return {"news": processed_news}
-        except Exception as e:
-            return {"error": f"News API error: {str(e)}"}
+            _newscache.set(ticker, news, expire=_NEWS_TTL)
+
+        return [
+            {
+                "title": article.get("title", "Untitled Article"),
+                "source": article.get("source", "Unknown"),
+                "url": article.get("url", ""),
+                "published_date": article.get("published_date", "Date not available"),
+                "content": article.get("content", ""),
+            }
+            for article in news.get("results", [])[:3]
+        ]
+
+    def _summarize_articles(self, articles: List[Dict]) -> List[str]:
+        """Summarize articles, asking Gemini only for those not already cached"""
+        summaries = [None] * len(articles)
+        missing = []
+        for i, article in enumerate(articles):
+            text = article.get("content", "")
+            if not text:
+                summaries[i] = "No summary available"
+                continue
+            key = _summary_key(text, article.get("url", ""))
+            if key in _sumcache:
+                summaries[i] = _sumcache[key]
+            else:
+                missing.append((i, text, key))
+
+        if len(missing) > 1:
+            try:
+                batch = self._summarize_batch([text for _, text, _ in missing])
+                for (i, _, key), summary in zip(missing, batch):
+                    _sumcache[key] = summaries[i] = summary
+                missing = []
+            except Exception:
+                pass  # fall back to one summary per article below
+
+        # Per-article summaries are independent LLM round-trips, so run them side by side
+        futures = [
+            (i, self._pool.submit(self._summarize_article, text, articles[i].get("url", "")))
+            for i, text, _ in missing
+        ]
+        for i, future in futures:
+            summaries[i] = future.result()
+        return summaries
 
-    def _summarize_article(self, text: str) -> str:
+    def _summarize_batch(self, texts: List[str]) -> List[str]:
+        """Summarize several articles with a single Gemini call"""
+        blocks = "\n".join(
+            f"===ARTICLE {i+1}===\n{text[:3000]}" for i, text in enumerate(texts))
+
+        prompt = _BATCH_SUMMARY_TMPL.format(blocks=blocks)
+
+        response = self.llm.generate_content(
+            prompt,
+            generation_config=self.generation_config
+        )
+        # Summaries are cached for good, so a cut-off batch must not be accepted
+        if response.candidates[0].finish_reason.name != "STOP":
+            raise ValueError("Batch summary was truncated")
+        return split_article_blocks(response.text, len(texts))
+
+    def _summarize_article(self, text: str, url: str = "") -> str:
         """Generate 3-5 bullet point summary using Gemini"""
         if not text:
             return "No summary available"
+
+        key = _summary_key(text, url)
+        if key in _sumcache:
+            return _sumcache[key]
             
-        prompt = f"""
-        Summarize this article in 3-5 concise bullet points:
-        {text[:3000]}
-        
-        Format strictly as:
-        - Point 1
-        - Point 2
-        - Point 3
-        """
+        prompt = _SUMMARY_TMPL.format(text=text[:3000])
         
         try:
+            # Safe from worker threads: the model's underlying gRPC client is thread-safe
             response = self.llm.generate_content(
                 prompt,
                 generation_config=self.generation_config
             )
-            return response.text.strip()
+            summary = response.text.strip()
         except Exception as e:
             return f"Summary error: {str(e)}"
+        _sumcache[key] = summary
+        return summary
 
     def _generate_analysis(self, ticker: str, price: float, 
                          sma_50: float, sma_200: float,
@@ -167,60 +401,39 @@ class MarketAgent:
             f"{i+1}. {n.get('title')} ({n.get('source')})" 
             for i, n in enumerate(news_items[:3]))
         
-        prompt = f"""
-        Stock Analysis Report for {ticker}:
-        
-        Current Price: ${price:.2f}
-        50-Day SMA: ${sma_50:.2f}
-        200-Day SMA: ${sma_200:.2f}
-        
-        Recent News:
-        {news_context}
-        
-        Provide:
-        1. Recommendation (Buy/Hold/Sell)
-        2. 3 Key Reasons (bullet points)
-        3. Price Targets (Conservative/Aggressive)
-        
-        Format exactly as:
-        Recommendation: [Your Verdict]
-        Reasons:
-        - Reason 1
-        - Reason 2
-        - Reason 3
-        Targets:
-        - Conservative: $X
-        - Aggressive: $Y
-        """
+        prompt = _ANALYSIS_TMPL.format(
+            ticker=ticker,
+            price=price,
+            sma_50=sma_50,
+            sma_200=sma_200,
+            news_context=news_context,
+        )
         
         try:
             response = self.llm.generate_content(
                 prompt,
                 generation_config=self.generation_config
             )
-            return {
-                "raw": response.text,
-                "recommendation": self._extract_recommendation(response.text),
-                "key_points": self._extract_bullet_points(response.text),
-                "targets": self._extract_price_targets(response.text)
-            }
+            return {"raw": response.text, **parse_analysis(response.text)}
         except Exception as e:
             return f"Analysis error: {str(e)}"
     
     def _decide_need_news(self, price: float, sma_50: float, sma_200: float) -> bool:
+        """
+        Return True if recent news is needed for a better recommendation:
+        price has moved more than 5% away from the 50-day SMA, or the price
+        and SMA trends disagree. Set USE_LLM_GATE to ask Gemini instead.
+        """
+        if _USE_LLM_GATE:
+            return self._ask_llm_need_news(price, sma_50, sma_200)
+        return abs(price - sma_50) / sma_50 > 0.05 or (sma_50 < sma_200) != (price < sma_50)
+
+    def _ask_llm_need_news(self, price: float, sma_50: float, sma_200: float) -> bool:
         """
         Ask Gemini: given price and SMAs, do we need recent news
         to make a better recommendation? Return True if yes.
         """
-        prompt = f"""
-    We have the following data for a stock:
-    - Current Price: ${price:.2f}
-    - 50-Day SMA: ${sma_50:.2f}
-    - 200-Day SMA: ${sma_200:.2f}
-
-    Question: Do you need recent news articles to give a better
-    Buy/Hold/Sell recommendation? Answer ONLY "Yes" or "No".
-    """
+        prompt = _NEED_NEWS_TMPL.format(price=price, sma_50=sma_50, sma_200=sma_200)
 
         try:
             resp = self.llm.generate_content(
@@ -231,36 +444,3 @@ class MarketAgent:
         except:
             # on LLM failure, default to fetching news
             return True
-
-
-    def _extract_recommendation(self, text: str) -> str:
-        """Extract recommendation from Gemini response"""
-        lines = text.split('\n')
-        for line in lines:
-            if "recommendation:" in line.lower():
-                return line.split(':')[-1].strip()
-        return "Hold"
-
-    def _extract_bullet_points(self, text: str) -> List[str]:
-        """Extract bullet points from Gemini response"""
-        points = []
-        in_reasons = False
-        for line in text.split('\n'):
-            if "reasons:" in line.lower():
-                in_reasons = True
-                continue
-            if in_reasons and line.strip().startswith('-'):
-                points.append(line.strip()[2:])
-            if len(points) >= 3:
-                break
-        return points
-
-    def _extract_price_targets(self, text: str) -> Dict:
-        """Extract price targets from Gemini response"""
-        targets = {"conservative": None, "aggressive": None}
-        for line in text.split('\n'):
-            if "conservative:" in line.lower():
-                targets["conservative"] = line.split('$')[-1].strip()
-            elif "aggressive:" in line.lower():
-                targets["aggressive"] = line.split('$')[-1].strip()
-        return targets
@@ -0,0 +1,65 @@
+import re
+from typing import Dict, List
+
+# One line of the analysis format requested in MarketAgent._generate_analysis.
+# Labels must open the line (after an optional "-"/"*" bullet, "1." number,
+# "#" heading or "**" bold marker), so a reason that merely mentions
+# "targets:" or "recommendation:" stays a reason. Every line matches;
+# unmatched ones only fill <body>.
+_ANALYSIS_LINE = re.compile(
+    r"^[ \t]*(?P<marker>[-*][ \t]+)?(?P<body>"
+    r"(?:\d+[.)][ \t]*)?(?:#+[ \t]*)?(?:\*\*)?(?:"
+    r"conservative(?:\*\*)?:(?:\*\*)?[ \t*]*\$?(?P<cons>[^\r\n*]*?)[ \t*]*"
+    r"|aggressive(?:\*\*)?:(?:\*\*)?[ \t*]*\$?(?P<aggr>[^\r\n*]*?)[ \t*]*"
+    # The verdict may carry its own emphasis ("Buy - with *caution*"); only a
+    # matching pair wrapped around the whole value is stripped
+    r"|recommendation(?:\*\*)?:(?:\*\*)?[ \t]*(?P<em>\*{1,2})?(?P<rec>[^\r\n]*?)(?P=em)?"
+    # Section headers carry nothing after the colon
+    r"|(?P<section>reasons|targets)(?:\*\*)?:(?:\*\*)?"
+    r")"
+    r"|[^\r\n]*?"
+    r")[ \t\r]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# An ===ARTICLE N=== delimiter, with any markdown (**, #, _) Gemini wraps it in
+_ARTICLE_DELIM = re.compile(r"[ \t*_#]*===ARTICLE (\d+)===[ \t*_]*")
+
+
+def parse_analysis(text: str) -> Dict:
+    """Extract recommendation, reasons and price targets in one pass"""
+    recommendation = None
+    points: List[str] = []
+    targets = {"conservative": None, "aggressive": None}
+    section = None
+    for m in _ANALYSIS_LINE.finditer(text):
+        if m.group("cons") is not None:
+            targets["conservative"] = m.group("cons")
+        elif m.group("aggr") is not None:
+            targets["aggressive"] = m.group("aggr")
+        elif m.group("rec") is not None and recommendation is None:
+            recommendation = m.group("rec")
+        elif m.group("section") is not None:
+            section = m.group("section").lower()
+        elif m.group("marker") and section == "reasons" and len(points) < 3:
+            # Only bullets under "Reasons:" count, not the target lines
+            points.append(m.group("body"))
+    return {
+        "recommendation": recommendation or "Hold",
+        "key_points": points,
+        "targets": targets,
+    }
+
+
+def split_article_blocks(text: str, count: int) -> List[str]:
+    """
+    Summaries 1..count from a batched ===ARTICLE N=== response, matched up by
+    N rather than position. Raises ValueError if any block is missing or empty.
+    """
+    # [preamble, n, block, n, block, ...]
+    parts = _ARTICLE_DELIM.split(text)[1:]
+    by_number = {int(n): block.strip() for n, block in zip(parts[::2], parts[1::2])}
+    blocks = [by_number.get(i + 1) for i in range(count)]
+    if not all(blocks):
+        raise ValueError("Batch summary did not return one block per article")
+    return blocks
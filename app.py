@@ -1,19 +1,166 @@
 import streamlit as st
 from agent import MarketAgent
-import plotly.express as px
-import pandas as pd
+import plotly.graph_objects as go
 from datetime import datetime
-from dotenv import load_dotenv
-import os
-import yfinance as yf
+import queue
+import threading
+import weakref
+from typing import Dict, Generator, Iterator, List, Tuple
 from advanced_recommender import AdvancedRecommender
 import re
 
-# Load environment variables
-load_dotenv()
+# Initialize agent once per process, not on every rerun
+@st.cache_resource
+def get_agent() -> MarketAgent:
+    return MarketAgent(ttl=300)
+
+
+agent = get_agent()
+
+
+@st.cache_resource
+def get_recommender() -> AdvancedRecommender:
+    return AdvancedRecommender(ttl=300)
+
+
+_DONE = object()
+# Items a drain may buffer ahead of its reader; the Gemini stream is far shorter
+_PREFETCH_MAX = 256
+
+
+def _prefetch(chunks: Generator) -> Iterator:
+    """
+    Drain an iterator on its own thread; the returned iterator yields items as
+    they arrive. Once that iterator is closed or garbage-collected (a re-click
+    or ticker change interrupts the script run), the drain stops at its next
+    item instead of running on unread.
+    """
+    q: queue.Queue = queue.Queue(maxsize=_PREFETCH_MAX)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Bounded, so wake up now and then to see whether the reader is gone
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def drain():
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    break
+        except Exception as e:
+            put(e)
+        finally:
+            chunks.close()
+            put(_DONE)
+
+    def replay():
+        try:
+            while True:
+                item = q.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+    it = replay()
+    # A replay that was never started doesn't run its finally, so also stop on GC
+    weakref.finalize(it, stop.set)
+    # Start now; a bare generator body wouldn't start until first iterated.
+    # A thread per stream rather than a shared pool: each one is held for a
+    # whole pipeline or LLM stream, which would queue other sessions behind it
+    threading.Thread(target=drain, daemon=True).start()
+    return it
+
+
+def fetch_all(ticker: str) -> Tuple[Iterator[Dict], Iterator[str]]:
+    """
+    Start the analysis and the recommendation together; neither depends on
+    the other. Both are cached for a few minutes inside the agent and the
+    recommender, so repeat clicks replay instantly.
+    """
+    sections = _prefetch(agent.analyze_iter(ticker))
+    recommendation = _prefetch(get_recommender().recommend_stream(ticker))
+    return sections, recommendation
+
+
+def render_news(news: List) -> None:
+    """Top news articles."""
+    st.subheader("📰 Top 3 News Articles")
+
+    if not news:
+        st.warning("No news available")
+    else:
+        for i, article in enumerate(news[:3]):  # Only show top 3
+            if isinstance(article, dict):
+                # Create columns for title + link icon
+                col1, col2 = st.columns([0.9, 0.1])
+
+                with col1:
+                    st.markdown(f"**{i+1}. {article.get('title', 'Untitled News')}**")
+
+                with col2:
+                    if article.get('url'):
+                        st.markdown(
+                            f"[<img src='https://cdn-icons-png.flaticon.com/512/159/159828.png' width=20>]({article['url']})",
+                            unsafe_allow_html=True
+                        )
+
+                # Publication date and summary
+                st.caption(f"🗓️ Published: {article.get('published_date', 'Date not available')}")
+
+                # AI-generated summary (3-5 lines)
+                summary = article.get('summary', 
+                    "No summary available. Click the link to read full article.")
+                st.write(summary)
+
+                st.divider()
+            else:
+                st.warning(str(article))  # Display API errors
+
+
+def render_ai_insight(stream: Iterator[str]) -> None:
+    """Advanced recommendation text and verdict badge."""
+    st.subheader("🤖 Advanced AI Recommendation")
+    adv_analysis = st.write_stream(stream)
+
+    match = re.search(r"\b(Buy|Sell|Hold)\b", adv_analysis, re.IGNORECASE)
+    if match:
+        rec = match.group(1).capitalize()
+        # Colors for each verdict
+        colors = {
+            "Buy":  ("#d4edda", "#155724"),  # light green bg, dark green border/text
+            "Sell": ("#f8d7da", "#721c24"),  # light red  bg, dark red   border/text
+            "Hold": ("#fff3cd", "#856404"),  # light yellow bg, dark yellow border/text
+        }
+        bg, fg = colors.get(rec, ("#eeeeee", "#333333"))
+        st.markdown(
+            f"""
+            <div style="
+                background-color: {bg};
+                color: {fg};
+                border-left: 6px solid {fg};
+                padding: 12px;
+                border-radius: 4px;
+                font-size: 1.1em;
+                font-weight: bold;
+            ">
+                Final Recommendation: {rec}
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
+    else:
+        st.info("🔍 Could not auto-detect a final recommendation.")
 
-# Initialize agent
-agent = MarketAgent()
 
 # Streamlit UI Config
 st.set_page_config(layout="wide")
@@ -29,138 +176,84 @@ with st.sidebar:
 if analyze_btn and ticker:
     with st.spinner(f"Analyzing {ticker}..."):
         try:
-            data = agent.analyze(ticker)
-            
-            if "error" in data:
-                st.error(f"Analysis failed: {data['error']}")
-            else:
-                # ===== Price Overview =====
-                col1, col2, col3 = st.columns(3)
-                col1.metric("Current Price", f"${data['price']:.2f}")
-                # 50-Day SMA
-                col2.metric(
-                    "50-Day SMA",
-                    f"${data['sma_50']:.2f}",
-                    delta=f"{(data['price'] - data['sma_50']) / data['sma_50'] * 100:.1f}%"
-                )
-
-                # 200-Day SMA
-                col3.metric(
-                    "200-Day SMA",
-                    f"${data['sma_200']:.2f}",
-                    delta=f"{(data['price'] - data['sma_200']) / data['sma_200'] * 100:.1f}%"
-                )
-
-                with st.expander("🧠 Agent Reasoning Log"):
-                     for line in data["reasoning"]:
-                        st.markdown(f"- {line}")
-                
-                # ===== Price Chart =====
-                st.subheader("📊 Price Trends")
-                # Prepare time series chart with Date index
-                hist_df = pd.DataFrame({
-                    "Date": pd.date_range(end=datetime.now(), periods=len(data.get("price_history", []))),
-                    "Price": data.get("price_history", []),
-                    "50-Day SMA": data.get("sma_50_history", []),
-                    "200-Day SMA": data.get("sma_200_history", [])
-                }).set_index("Date")
-
-                # Melt dataframe to long format for plotly
-                hist_df_long = hist_df.reset_index().melt(id_vars="Date", var_name="Metric", value_name="Value")
-
-                # Plot with Plotly Express
-                fig = px.line(
-                    hist_df_long,
-                    x="Date",
-                    y="Value",
-                    color="Metric",
-                    labels={"Value": "Price ($)", "Date": "Date"}
-                )
-                st.plotly_chart(fig, use_container_width=True)
-                info = yf.Ticker(ticker).info
-
-                # Display them in two rows of columns
-                row1 = st.columns(4)
-                row1[0].metric("Open",       f"${info['open']:.2f}")
-                row1[1].metric("Day Low",    f"${info['dayLow']:.2f}")
-                row1[2].metric("Day High",   f"${info['dayHigh']:.2f}")
-                row1[3].metric("Volume",     f"{info['volume']:,}")
-
-                row2 = st.columns(2)
-                row2[0].metric("52W Low",    f"${info['fiftyTwoWeekLow']:.2f}")
-                row2[1].metric("52W High",   f"${info['fiftyTwoWeekHigh']:.2f}")
-                
-                # ===== News Section ==
-               # Display News Section
-                st.subheader("📰 Top 3 News Articles")
-
-                if not data['news']:
-                    st.warning("No news available")
-                else:
-                    for i, article in enumerate(data['news'][:3]):  # Only show top 3
-                        if isinstance(article, dict):
-                            # Create columns for title + link icon
-                            col1, col2 = st.columns([0.9, 0.1])
-                            
-                            with col1:
-                                st.markdown(f"**{i+1}. {article.get('title', 'Untitled News')}**")
-                            
-                            with col2:
-                                if article.get('url'):
-                                    st.markdown(
-                                        f"[<img src='https://cdn-icons-png.flaticon.com/512/159/159828.png' width=20>]({article['url']})",
-                                        unsafe_allow_html=True
-                                    )
-                            
-                            # Publication date and summary
-                            st.caption(f"🗓️ Published: {article.get('published_date', 'Date not available')}")
-                            
-                            # AI-generated summary (3-5 lines)
-                            summary = article.get('summary', 
-                                "No summary available. Click the link to read full article.")
-                            st.write(summary)
-                            
-                            st.divider()
-                        else:
-                            st.warning(str(article))  # Display API errors
-                
-                # ===== AI Insights =====
-                recommender = AdvancedRecommender()
-                adv_analysis = recommender.recommend(ticker)
-                st.subheader("🤖 Advanced AI Recommendation")
-                st.write(adv_analysis)
-
-                match = re.search(r"\b(Buy|Sell|Hold)\b", adv_analysis, re.IGNORECASE)
-                if match:
-                    rec = match.group(1).capitalize()
-                    # Colors for each verdict
-                    colors = {
-                        "Buy":  ("#d4edda", "#155724"),  # light green bg, dark green border/text
-                        "Sell": ("#f8d7da", "#721c24"),  # light red  bg, dark red   border/text
-                        "Hold": ("#fff3cd", "#856404"),  # light yellow bg, dark yellow border/text
-                    }
-                    bg, fg = colors.get(rec, ("#eeeeee", "#333333"))
-                    st.markdown(
-                        f"""
-                        <div style="
-                            background-color: {bg};
-                            color: {fg};
-                            border-left: 6px solid {fg};
-                            padding: 12px;
-                            border-radius: 4px;
-                            font-size: 1.1em;
-                            font-weight: bold;
-                        ">
-                            Final Recommendation: {rec}
-                        </div>
-                        """,
-                        unsafe_allow_html=True,
+            sections, adv_stream = fetch_all(ticker)
+
+            # Render each part of the analysis as soon as the agent yields it
+            data = {}
+            for part in sections:
+                data.update(part)
+                section = part["section"]
+
+                if section == "error":
+                    st.error(f"Analysis failed: {data['error']}")
+
+                elif section == "price":
+                    # ===== Price Overview =====
+                    col1, col2, col3 = st.columns(3)
+                    col1.metric("Current Price", f"${data['price']:.2f}")
+                    # 50-Day SMA
+                    col2.metric(
+                        "50-Day SMA",
+                        f"${data['sma_50']:.2f}",
+                        delta=f"{(data['price'] - data['sma_50']) / data['sma_50'] * 100:.1f}%"
+                    )
+
+                    # 200-Day SMA
+                    col3.metric(
+                        "200-Day SMA",
+                        f"${data['sma_200']:.2f}",
+                        delta=f"{(data['price'] - data['sma_200']) / data['sma_200'] * 100:.1f}%"
                     )
-                else:
-                    st.info("🔍 Could not auto-detect a final recommendation.")
-                
-                st.caption(f"Last updated: {datetime.fromisoformat(data['timestamp']).strftime('%Y-%m-%d %H:%M:%S')}")
-                
+
+                    # Filled in once the agent has finished reasoning
+                    reasoning_box = st.container()
+
+                    # ===== Price Chart =====
+                    st.subheader("📊 Price Trends")
+                    # One WebGL trace per series, on the trading dates from yfinance
+                    hist_df = data["hist_df"]
+                    fig = go.Figure()
+                    for name in hist_df.columns:
+                        fig.add_trace(go.Scattergl(
+                            x=hist_df.index, y=hist_df[name].to_numpy(), mode="lines", name=name))
+                    fig.update_layout(
+                        xaxis_title="Date",
+                        yaxis_title="Price ($)",
+                        legend_title_text="Metric"
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+
+                    info = data["info"]
+
+                    # Display them in two rows of columns
+                    if info:
+                        row1 = st.columns(4)
+                        row1[0].metric("Open",       f"${info['open']:.2f}")
+                        row1[1].metric("Day Low",    f"${info['dayLow']:.2f}")
+                        row1[2].metric("Day High",   f"${info['dayHigh']:.2f}")
+                        row1[3].metric("Volume",     f"{info['volume']:,}")
+
+                        row2 = st.columns(2)
+                        row2[0].metric("52W Low",    f"${info['fiftyTwoWeekLow']:.2f}")
+                        row2[1].metric("52W High",   f"${info['fiftyTwoWeekHigh']:.2f}")
+                    else:
+                        st.warning("Quote details unavailable")
+
+                elif section == "news":
+                    # ===== News Section =====
+                    render_news(data['news'])
+
+                    # ===== AI Insights =====
+                    # Has been streaming in the background; no need to wait for the agent's verdict
+                    render_ai_insight(adv_stream)
+
+                elif section == "ai":
+                    with reasoning_box.expander("🧠 Agent Reasoning Log"):
+                        for line in data["reasoning"]:
+                            st.markdown(f"- {line}")
+
+                    st.caption(f"Last updated: {datetime.fromisoformat(data['timestamp']).strftime('%Y-%m-%d %H:%M:%S')}")
+
         except Exception as e:
             st.error(f"Critical error: {str(e)}")
             st.exception(e)
@@ -0,0 +1,96 @@
+import numpy as np
+from numba import njit, prange
+
+
+# Explicit signatures compile eagerly at import (or load from __pycache__ via
+# cache=True), so the first request never waits on LLVM
+@njit(["float32[:](float32[:], int64)", "float64[:](float64[:], int64)"], cache=True)
+def rolling_mean(x, w):
+    """Trailing mean over w points with a running sum; NaN until the window fills."""
+    n = len(x)
+    out = np.empty_like(x)
+    s = 0.0
+    for i in range(n):
+        s += x[i]
+        if i >= w:
+            s -= x[i - w]
+        out[i] = s / w if i >= w - 1 else np.nan
+    return out
+
+
+@njit(["UniTuple(float32[:], 2)(float32[:], int64, int64)",
+       "UniTuple(float64[:], 2)(float64[:], int64, int64)"], cache=True)
+def sma_pair(x, w1, w2):
+    """Two trailing means in one pass over x, e.g. SMA-50 and SMA-200."""
+    n = len(x)
+    out1 = np.empty_like(x)
+    out2 = np.empty_like(x)
+    s1 = 0.0
+    s2 = 0.0
+    for i in range(n):
+        v = x[i]
+        s1 += v
+        s2 += v
+        if i >= w1:
+            s1 -= x[i - w1]
+        if i >= w2:
+            s2 -= x[i - w2]
+        out1[i] = s1 / w1 if i >= w1 - 1 else np.nan
+        out2[i] = s2 / w2 if i >= w2 - 1 else np.nan
+    return out1, out2
+
+
+@njit(parallel=True, cache=True)
+def batch_indicators(close2d):
+    """
+    Latest SMA-50, SMA-200, RSI-14, MACD(12, 26) and signal(9) for every row
+    of a (n_tickers, n_days) close matrix. Shorter histories are left-padded
+    with NaN. Values needing more history than a row has come back as NaN.
+    """
+    n, m = close2d.shape
+    sma50 = np.full(n, np.nan)
+    sma200 = np.full(n, np.nan)
+    rsi = np.full(n, np.nan)
+    macd = np.full(n, np.nan)
+    signal = np.full(n, np.nan)
+    a_fast, a_slow, a_sig = 2 / 13, 2 / 27, 2 / 10
+
+    for k in prange(n):
+        row = close2d[k]
+        start = 0
+        while start < m and np.isnan(row[start]):
+            start += 1
+        length = m - start
+        if length == 0:
+            continue
+
+        if length >= 50:
+            sma50[k] = row[m - 50:].mean()
+        if length >= 200:
+            sma200[k] = row[m - 200:].mean()
+
+        # RSI over (up to) the last 14 price changes
+        up = 0.0
+        down = 0.0
+        for i in range(max(start + 1, m - 14), m):
+            d = row[i] - row[i - 1]
+            if d > 0:
+                up += d
+            else:
+                down -= d
+        if length > 1:
+            rsi[k] = 100.0 if down == 0 else 100 - 100 / (1 + up / down)
+
+        # MACD with the ewm(adjust=False) recurrences
+        f = s = row[start]
+        sig = 0.0
+        mac = 0.0
+        for i in range(start, m):
+            f = a_fast * row[i] + (1 - a_fast) * f
+            s = a_slow * row[i] + (1 - a_slow) * s
+            mac = f - s
+            sig = a_sig * mac + (1 - a_sig) * sig if i > start else mac
+        macd[k] = mac
+        signal[k] = sig
+
+    return sma50, sma200, rsi, macd, signal
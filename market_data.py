@@ -0,0 +1,95 @@
+import threading
+from typing import Dict, Iterable
+
+import yfinance as yf
+import pandas as pd
+import numpy as np
+from cachetools import TTLCache
+
+try:
+    from indicators_numba import rolling_mean, sma_pair
+except ImportError:  # numba is optional; fall back to the cumulative-sum SMAs
+    rolling_mean = sma_pair = None
+
+# The last history row is the live quote, so entries only live as long as one
+# cached analysis; a failed (empty) fetch is never stored and is retried next call
+_HISTORY_TTL = 120
+_history: TTLCache = TTLCache(maxsize=256, ttl=_HISTORY_TTL)
+_history_lock = threading.Lock()  # TTLCache itself isn't thread-safe
+
+# A cache doesn't collapse concurrent misses, so the agent and the recommender
+# asking for the same ticker at once would both download it; a striped lock
+# lets the second caller wait for the first one's result instead
+_FETCH_LOCKS = [threading.Lock() for _ in range(32)]
+
+
+def _download_history(ticker: str) -> pd.DataFrame:
+    """Download 1y of daily history, keeping only the columns read downstream."""
+    # A fresh Ticker per download: yfinance keeps a full copy of the frame on the
+    # Ticker, which a memoised one would hold beyond this trimmed, bounded cache
+    hist = yf.Ticker(ticker).history(period="1y")
+    if hist.empty:
+        return hist
+    return hist[["Close", "Volume"]]
+
+
+def get_history(ticker: str) -> pd.DataFrame:
+    """
+    Return 1y of daily Close/Volume history for ticker, served from memory
+    for a couple of minutes after each fetch. Returns an empty frame if
+    nothing was found. Callers share the cached frame and must not mutate it.
+    """
+    with _FETCH_LOCKS[hash(ticker) % len(_FETCH_LOCKS)]:
+        with _history_lock:
+            hist = _history.get(ticker)
+        if hist is None:
+            hist = _download_history(ticker)
+            if hist.empty:
+                return pd.DataFrame()
+            with _history_lock:
+                _history[ticker] = hist
+        return hist
+
+
+def get_info(ticker: str) -> Dict:
+    """Current quote summary (open, day range, volume, 52w range) for ticker."""
+    # yf.Ticker memoises .info forever, so a memoised Ticker would serve a stale
+    # intraday quote; use a fresh one instead (yfinance pools the connection)
+    return yf.Ticker(ticker).info
+
+
+def as_float_array(x) -> np.ndarray:
+    """x as a floating NumPy array; float32 input stays float32."""
+    x = np.asarray(x)
+    return x if np.issubdtype(x.dtype, np.floating) else x.astype(np.float64)
+
+
+def sma_all(close: np.ndarray, windows: Iterable[int] = (50, 200)) -> Dict[int, np.ndarray]:
+    """
+    Simple moving averages for several windows, via the jitted running-sum
+    kernels when numba is available (fused for a pair of windows),
+    otherwise from one cumulative sum.
+    Each output has the same length and float dtype as close, NaN until
+    the window fills.
+    """
+    close = as_float_array(close)
+    if rolling_mean is not None:
+        # The eager signatures only take writable arrays; a read-only view (e.g.
+        # from to_numpy() under pandas copy-on-write) is copied, others pass through
+        close = np.require(close, requirements="W")
+        windows = tuple(windows)
+        if len(windows) == 2:
+            # The usual 50/200 pair: one fused pass instead of two
+            return dict(zip(windows, sma_pair(close, *windows)))
+        return {w: rolling_mean(close, w) for w in windows}
+
+    # Accumulate in float64: differencing large float32 prefix sums loses precision
+    c = np.concatenate(([0.0], np.cumsum(close, dtype=np.float64)))
+    out = {}
+    for w in windows:
+        if w > len(close):
+            out[w] = np.full(len(close), np.nan, dtype=close.dtype)
+            continue
+        s = (c[w:] - c[:-w]) / w
+        out[w] = np.concatenate((np.full(w - 1, np.nan), s)).astype(close.dtype, copy=False)
+    return out
@@ -0,0 +1,128 @@
+import pytest
+
+from analysis_parser import parse_analysis, split_article_blocks
+
+
+BASELINE = """Recommendation: Buy
+Reasons:
+- Price is above both moving averages
+- Strong quarterly earnings
+- Positive analyst coverage
+Targets:
+- Conservative: $150
+- Aggressive: $180
+"""
+
+
+def test_baseline_format():
+    parsed = parse_analysis(BASELINE)
+    assert parsed["recommendation"] == "Buy"
+    assert parsed["key_points"] == [
+        "Price is above both moving averages",
+        "Strong quarterly earnings",
+        "Positive analyst coverage",
+    ]
+    assert parsed["targets"] == {"conservative": "150", "aggressive": "180"}
+
+
+def test_crlf_line_endings():
+    parsed = parse_analysis(BASELINE.replace("\n", "\r\n"))
+    assert parsed["recommendation"] == "Buy"
+    assert parsed["key_points"][0] == "Price is above both moving averages"
+    assert parsed["targets"] == {"conservative": "150", "aggressive": "180"}
+
+
+def test_bold_labels():
+    parsed = parse_analysis(
+        "**Recommendation:** **Sell**\n"
+        "**Reasons:**\n"
+        "- Weak guidance\n"
+        "**Targets:**\n"
+        "- **Conservative:** $150\n"
+        "- **Aggressive**: $120\n"
+    )
+    assert parsed["recommendation"] == "Sell"
+    assert parsed["key_points"] == ["Weak guidance"]
+    assert parsed["targets"] == {"conservative": "150", "aggressive": "120"}
+
+
+def test_star_bullets():
+    parsed = parse_analysis(
+        "Recommendation: Hold\n"
+        "Reasons:\n"
+        "* Flat revenue\n"
+        "* Rich valuation\n"
+        "Targets:\n"
+        "* Conservative: $40\n"
+        "* Aggressive: $55\n"
+    )
+    assert parsed["key_points"] == ["Flat revenue", "Rich valuation"]
+    assert parsed["targets"] == {"conservative": "40", "aggressive": "55"}
+
+
+def test_labels_inside_reasons_stay_reasons():
+    parsed = parse_analysis(
+        "Recommendation: Buy\n"
+        "Reasons:\n"
+        "- Analyst price targets: raised across the board\n"
+        "- Recommendation: upgraded by two brokers\n"
+        "- Buybacks continue\n"
+        "Targets:\n"
+        "- Conservative: $90\n"
+        "- Aggressive: $110\n"
+    )
+    assert parsed["recommendation"] == "Buy"
+    assert parsed["key_points"] == [
+        "Analyst price targets: raised across the board",
+        "Recommendation: upgraded by two brokers",
+        "Buybacks continue",
+    ]
+    assert parsed["targets"] == {"conservative": "90", "aggressive": "110"}
+
+
+def test_numbered_labels():
+    parsed = parse_analysis(
+        "1. Recommendation: Buy\n"
+        "2. Reasons:\n"
+        "- a\n"
+        "- b\n"
+        "3) Targets:\n"
+        "- Conservative: $10\n"
+    )
+    assert parsed["recommendation"] == "Buy"
+    assert parsed["key_points"] == ["a", "b"]
+    assert parsed["targets"]["conservative"] == "10"
+
+
+def test_emphasis_inside_recommendation():
+    assert parse_analysis("Recommendation: Buy - with *caution*")["recommendation"] == (
+        "Buy - with *caution*")
+    assert parse_analysis("Recommendation: *Hold*")["recommendation"] == "Hold"
+
+
+def test_missing_fields_default():
+    parsed = parse_analysis("No structured answer")
+    assert parsed["recommendation"] == "Hold"
+    assert parsed["key_points"] == []
+    assert parsed["targets"] == {"conservative": None, "aggressive": None}
+
+
+def test_article_blocks_matched_by_number():
+    blocks = split_article_blocks(
+        "Here are the summaries:\n"
+        "===ARTICLE 2===\n- b1\n- b2\n"
+        "===ARTICLE 1===\n- a1\n",
+        2,
+    )
+    assert blocks == ["- a1", "- b1\n- b2"]
+
+
+def test_article_blocks_strip_markdown_delimiters():
+    blocks = split_article_blocks(
+        "**===ARTICLE 1===**\r\n- a1\r\n\n## ===ARTICLE 2===\n- b1\n", 2)
+    assert blocks == ["- a1", "- b1"]
+
+
+def test_article_blocks_missing_number_rejected():
+    with pytest.raises(ValueError):
+        split_article_blocks("===ARTICLE 1===\n- a1\n===ARTICLE 3===\n- c1\n", 2)
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import advanced_recommender
+import market_data
+from advanced_recommender import _compute_macd, _compute_rsi, _compute_volatility
+from market_data import sma_all
+
+requires_numba = pytest.mark.skipif(market_data.rolling_mean is None, reason="numba not installed")
+
+
+def _walk(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (100 + np.cumsum(rng.normal(size=n))).astype(np.float32)
+
+
+def _ref_macd(close: np.ndarray) -> dict:
+    s = pd.Series(close, dtype=np.float64)
+    macd = s.ewm(span=12, adjust=False).mean() - s.ewm(span=26, adjust=False).mean()
+    signal = macd.ewm(span=9, adjust=False).mean()
+    return {"macd": macd.iloc[-1], "signal": signal.iloc[-1]}
+
+
+def _ref_rsi(close: np.ndarray, period: int = 14) -> float:
+    d = pd.Series(close, dtype=np.float64).diff()
+    up = d.clip(lower=0).rolling(period).mean().iloc[-1]
+    down = (-d.clip(upper=0)).rolling(period).mean().iloc[-1]
+    return 100 - 100 / (1 + up / down)
+
+
+@pytest.fixture(params=["numba", "cumsum"])
+def sma_path(request, monkeypatch):
+    if request.param == "numba":
+        if market_data.rolling_mean is None:
+            pytest.skip("numba not installed")
+    else:
+        monkeypatch.setattr(market_data, "rolling_mean", None)
+        monkeypatch.setattr(market_data, "sma_pair", None)
+    return request.param
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("windows", [(50, 200), (20,), (5, 50, 200)])
+def test_sma_all_matches_rolling_mean(sma_path, dtype, windows):
+    close = _walk(300).astype(dtype)
+    out = sma_all(close, windows)
+    for w in windows:
+        expected = pd.Series(close).rolling(w).mean().to_numpy()
+        assert out[w].dtype == dtype
+        np.testing.assert_allclose(out[w], expected, rtol=1e-5, equal_nan=True)
+
+
+def test_sma_all_window_longer_than_history(sma_path):
+    out = sma_all(_walk(120), (50, 200))
+    assert np.isnan(out[200]).all()
+    assert np.isnan(out[50][:49]).all() and not np.isnan(out[50][49:]).any()
+
+
+def test_sma_all_accepts_read_only_input(sma_path):
+    close = _walk(300)
+    close.flags.writeable = False
+    expected = pd.Series(close).rolling(200).mean().to_numpy()
+    np.testing.assert_allclose(sma_all(close)[200], expected, rtol=1e-5, equal_nan=True)
+
+
+def test_rsi_matches_pandas():
+    close = _walk(300)
+    assert _compute_rsi(close) == pytest.approx(_ref_rsi(close), rel=1e-4)
+
+
+def test_volatility_matches_pandas():
+    close = _walk(300)
+    expected = pd.Series(close, dtype=np.float64).pct_change().rolling(20).std().iloc[-1] * 100
+    assert _compute_volatility(close) == pytest.approx(expected, rel=1e-4)
+
+
+def test_macd_matches_ewm():
+    close = _walk(300)
+    assert _compute_macd(close) == pytest.approx(_ref_macd(close), rel=1e-4)
+
+
+def test_macd_lfilter_fallback_matches_ewm(monkeypatch):
+    scipy_signal = pytest.importorskip("scipy.signal")
+    monkeypatch.setattr(advanced_recommender, "njit", None)
+    monkeypatch.setattr(advanced_recommender, "lfilter", scipy_signal.lfilter, raising=False)
+    close = _walk(300)
+    assert _compute_macd(close) == pytest.approx(_ref_macd(close), rel=1e-4)
+
+
+@requires_numba
+def test_batch_indicators_match_unpadded_series():
+    from indicators_numba import batch_indicators
+
+    closes = [_walk(300, seed=1), _walk(250, seed=2), _walk(120, seed=3)]
+    width = max(len(c) for c in closes)
+    close2d = np.full((len(closes) + 1, width), np.nan, dtype=np.float32)
+    for row, c in zip(close2d, closes):
+        row[width - len(c):] = c
+    # The last row is all padding: a ticker with no usable history
+
+    sma50, sma200, rsi, macd, signal = batch_indicators(close2d)
+    for k, c in enumerate(closes):
+        smas = sma_all(c, (50, 200))
+        assert sma50[k] == pytest.approx(smas[50][-1], rel=1e-5)
+        if len(c) >= 200:
+            assert sma200[k] == pytest.approx(smas[200][-1], rel=1e-5)
+        else:
+            assert np.isnan(sma200[k])
+        assert rsi[k] == pytest.approx(_compute_rsi(c), rel=1e-4)
+        assert macd[k] == pytest.approx(_compute_macd(c)["macd"], rel=1e-4)
+        assert signal[k] == pytest.approx(_compute_macd(c)["signal"], rel=1e-4)
+    assert np.isnan([sma50[-1], sma200[-1], rsi[-1], macd[-1], signal[-1]]).all()
+
+
+@requires_numba
+def test_analyze_many_reports_errors_per_ticker(monkeypatch):
+    agent = pytest.importorskip("agent")
+    histories = {"AAA": _walk(300, seed=1), "BBB": _walk(150, seed=2)}
+
+    def fake_history(ticker):
+        if ticker == "BAD":
+            raise RuntimeError("boom")
+        if ticker not in histories:
+            return pd.DataFrame()
+        return pd.DataFrame({"Close": histories[ticker]})
+
+    monkeypatch.setattr(agent, "get_history", fake_history)
+    out = agent.MarketAgent().analyze_many(["AAA", "BAD", "NONE", "BBB"])
+
+    assert list(out) == ["AAA", "BAD", "NONE", "BBB"]
+    assert out["BAD"] == {"error": "Stock data error: boom"}
+    assert out["NONE"] == {"error": "No historical data found for NONE"}
+    assert out["AAA"]["price"] == pytest.approx(float(histories["AAA"][-1]))
+    assert out["AAA"]["sma_200"] == pytest.approx(sma_all(histories["AAA"])[200][-1], rel=1e-5)
+    assert out["BBB"]["rsi"] == pytest.approx(_compute_rsi(histories["BBB"]), rel=1e-4)
+    assert np.isnan(out["BBB"]["sma_200"])